@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import Optional
 import numpy as np
 from pydantic import BaseModel
 
@@ -7,23 +8,40 @@ class Condition(BaseModel, ABC):
     condition_id: str
     likelihood: float
 
-    def is_active(self) -> bool:
-        return np.random.choice([True, False], p=[self.likelihood, 1 - self.likelihood])
+    def is_active(self, rng: Optional[np.random.RandomState] = None) -> bool:
+        rng = rng or np.random
+        return rng.choice([True, False], p=[self.likelihood, 1 - self.likelihood])
+
+    def is_active_batch(self, size: int, rng: Optional[np.random.RandomState] = None) -> np.ndarray:
+        rng = rng or np.random
+        return rng.random_sample(size) < self.likelihood
     
     @abstractmethod
-    def activate(self):
+    def activate(self, rng: Optional[np.random.RandomState] = None):
+        pass
+
+    @abstractmethod
+    def activate_batch(self, size: int, rng: Optional[np.random.RandomState] = None) -> np.ndarray:
         pass
 
 
 class StaticValueCondition(Condition):
     value: float
 
-    def activate(self) -> float:
+    def activate(self, rng: Optional[np.random.RandomState] = None) -> float:
         return self.value
+
+    def activate_batch(self, size: int, rng: Optional[np.random.RandomState] = None) -> np.ndarray:
+        return np.full(size, self.value)
     
 
 class MultipleValuesCondition(Condition):
     values: list[float]
     
-    def activate(self) -> float:
-        return np.random.choice(self.values)
\ No newline at end of file
+    def activate(self, rng: Optional[np.random.RandomState] = None) -> float:
+        rng = rng or np.random
+        return rng.choice(self.values)
+
+    def activate_batch(self, size: int, rng: Optional[np.random.RandomState] = None) -> np.ndarray:
+        rng = rng or np.random
+        return rng.choice(self.values, size)
\ No newline at end of file
@@ -1,5 +1,5 @@
 FIXED_COLS = [
-    "date", "customer_id", "order_number", 
+    "date", "customer_id", "order_number", "line_number",
     "item_category_id", "service_id", "variant", 
     "price", "quantity", "final_price",
     "new_customer", "contract_ammendment"
@@ -2,6 +2,8 @@ import numpy as np
 import pandas as pd
 
 from src.constants import FIXED_COLS
+from src.money.base import apply_factor
+from src.views.base import AnalyticalViews
 
 
 class Corruptor:
@@ -15,7 +17,10 @@ class Corruptor:
             cust_probability: float = 0.5,
             days_shift: int = 20,
             max_occurrences: int = 3,
-            missing_charges_prob: float = 0.01
+            missing_charges_prob: float = 0.01,
+            joint_condition_not_implemented_prob: float = 0.03,
+            analytical_views: bool = False,
+            minor_units: bool = False,
     ):
         self.random_price_change_prob = random_price_change_prob
         self.condition_not_implemented_prob = condition_not_implemented_prob
@@ -23,26 +28,48 @@ class Corruptor:
         self.days_shift = days_shift
         self.max_occurrences = max_occurrences
         self.missing_charges_prob = missing_charges_prob
+        self.joint_condition_not_implemented_prob = joint_condition_not_implemented_prob
+        self.analytical_views = analytical_views
+        self.minor_units = minor_units
 
     def _incorrect_price(self, df: pd.DataFrame) -> pd.DataFrame:
         active_rows = np.random.choice([True, False], size=df.shape[0], p=[self.random_price_change_prob, 1-self.random_price_change_prob])
-        prices = [price * (1 + np.random.rand()) if active else price for price, active in zip(df["price"], active_rows)]
-        df["price"] = prices
+        factors = np.where(active_rows, 1 + np.random.rand(df.shape[0]), 1)
+        if self.minor_units:
+            df["price"] = apply_factor(df["price"].to_numpy(), factors)
+        else:
+            df["price"] = df["price"] * factors
         df["flag_random_price_change"] = active_rows
         return df
     
     def _billing_logic_error(self, df: pd.DataFrame) -> pd.DataFrame:
-        condition_cols = df.filter(like="condition_").columns
+        condition_cols = [x for x in df.filter(like="condition_").columns if not x.endswith("_joint")]
         df["temp"] = df["final_price"]
         for cond in condition_cols:
             active_indexes = df[df[cond] == 1].index
             selected = np.random.choice(active_indexes, int(len(active_indexes) * self.condition_not_implemented_prob), replace=False)
-            df.loc[selected, "final_price"] = df.loc[selected, "price"] * df.loc[selected, "quantity"]
+            if self.minor_units:
+                df.loc[selected, "final_price"] = apply_factor(df.loc[selected, "price"].to_numpy(), df.loc[selected, "quantity"].to_numpy())
+            else:
+                df.loc[selected, "final_price"] = df.loc[selected, "price"] * df.loc[selected, "quantity"]
         df["final_price"] = df["final_price"]
         df["flag_condition_not_implemented"] = df["temp"] != df["final_price"]
         df.drop(columns="temp", inplace=True)
         return df
     
+    def _joint_condition_not_implemented(self, df: pd.DataFrame) -> pd.DataFrame:
+        joint_cols = [x for x in df.filter(like="condition_").columns if x.endswith("_joint")]
+        order_keys = pd.MultiIndex.from_frame(df[["date", "customer_id", "order_number"]])
+        active_orders = np.zeros(df.shape[0], dtype=bool)
+        for cond in joint_cols:
+            orders = order_keys[df[cond] == 1].unique()
+            selected = np.random.choice(len(orders), int(len(orders) * self.joint_condition_not_implemented_prob), replace=False)
+            active_orders |= order_keys.isin(orders[selected])
+        # The jointly drawn items are dropped, the rest of the order carries the flag
+        df["flag_joint_condition_not_implemented"] = active_orders
+        df = df[~(active_orders & (df[joint_cols] == 1).any(axis=1))]
+        return df.reset_index(drop=True)
+
     def _missing_information(self, df: pd.DataFrame) -> pd.DataFrame:
         contract_ammendments = (
             df[["customer_id", "date", "contract_ammendment"]]
@@ -87,9 +114,15 @@ class Corruptor:
         df["flag_missing_charges"] = df["flag_missing_charges"].fillna(False)
         return df
     
-    def process(self, df: pd.DataFrame) -> pd.DataFrame:
+    def process(self, df: pd.DataFrame) -> pd.DataFrame | tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+        if self.minor_units != pd.api.types.is_integer_dtype(df["price"]):
+            raise ValueError(
+                f"Corruptor(minor_units={self.minor_units}) does not match the dataset's {df['price'].dtype} prices, "
+                "use the same minor_units setting as the Universe"
+            )
         df = self._incorrect_price(df)
         df = self._billing_logic_error(df)
+        df = self._joint_condition_not_implemented(df)
         df = self._missing_information(df)
         df = self._missing_charges(df)
         df["flag_discrepancy"] = df.filter(like="flag_").sum(axis=1).astype(bool)
@@ -99,4 +132,6 @@ class Corruptor:
             + [x for x in df.columns if x not in self._cols and x not in df.filter(like="flag_").columns]
             + [x for x in df.filter(like="flag_").columns]
         ]
+        if self.analytical_views:
+            return df, AnalyticalViews().update(df).frames()
         return df
\ No newline at end of file
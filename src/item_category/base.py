@@ -1,86 +1,126 @@
 import warnings
 import numpy as np
 from typing import Optional
-from pydantic import BaseModel, model_validator
 
 from src.items.base import Item, create_item
 from src.sampling.distributions import Distribution
+from src.money.base import apply_factor, to_minor_units
 from src.conditions.base import Condition, StaticValueCondition, MultipleValuesCondition
 
 
 class ItemCategoryInclusionCondition(Condition):
-    item_category: "ItemCategory"
-    no_conditions: bool = False
+    """
+    Joint item category condition: when active on an order containing the source category but not the
+    target one, items from the target category are drawn into the order as well.
+    """
+    item_category_id: int
+    no_conditions: bool = True
     
-    def activate(self) -> int:
-        return self.item_category.sample_items(no_conditions=self.no_conditions)
+    def activate(self, rng: Optional[np.random.RandomState] = None) -> int:
+        return self.item_category_id
 
+    def activate_batch(self, size: int, rng: Optional[np.random.RandomState] = None) -> np.ndarray:
+        return np.full(size, self.item_category_id)
+
+
+def _select_items(likelihoods: np.ndarray, n_items: np.ndarray, rng: np.random.RandomState) -> np.ndarray:
+    # Weighted sampling without replacement for every order at once (Efraimidis-Spirakis):
+    # rank the items of each order by log(u) / likelihood and keep the first n_items of each row.
+    with np.errstate(divide="ignore"):
+        keys = np.log(rng.random_sample((n_items.size, likelihoods.size))) / likelihoods
+    ranked = np.argsort(-keys, axis=1, kind="stable")
+    return ranked[np.arange(likelihoods.size) < n_items[:, None]]
+
+
+def sample_category_items(
+        item_category_id: int,
+        likelihood: float,
+        quantity_distribution: Distribution,
+        items: list[Item],
+        prices: np.ndarray,
+        probability_condition: Optional[Condition] = None,
+        price_condition: Optional[Condition] = None,
+        n_orders: int = 1,
+        no_conditions: bool = False,
+        forced: bool = False,
+        minor_units: bool = False,
+        rng: Optional[np.random.RandomState] = None,
+    ) -> dict:
+    """
+    Sample a customer's items of one category for a batch of orders at once.
+
+    Args:
+        item_category_id (int): The unique identifier for the item category.
+        likelihood (float): The likelihood of the category being included in an order.
+        quantity_distribution (Distribution): The distribution of the number of items per order.
+        items (list[Item]): The items the customer can order; their likelihoods and distributions are used.
+        prices (np.ndarray): The customer's price for each item.
+        probability_condition (Optional[Condition], optional): The category's probability condition. Defaults to None.
+        price_condition (Optional[Condition], optional): The category's price condition. Defaults to None.
+        n_orders (int, optional): The number of orders in the batch. Defaults to 1.
+        no_conditions (bool, optional): Whether to ignore the probability and price conditions. Defaults to False.
+        forced (bool, optional): Whether every order includes at least one item of the category. Defaults to False.
+        minor_units (bool, optional): Whether prices are int64 minor units. Defaults to False.
+        rng (Optional[np.random.RandomState], optional): The random state to draw from. Defaults to the global numpy state.
+
+    Returns:
+        dict: One entry per sampled item line. `order_index` points into the batch and `conditions` lists the
+            conditions active on the line.
+    """
+    rng = rng or np.random
+    order_likelihood = np.full(n_orders, likelihood)
+    probability_active = np.zeros(n_orders, dtype=bool)
+    if probability_condition and not no_conditions:
+        probability_active = probability_condition.is_active_batch(n_orders, rng)
+        order_likelihood[probability_active] = probability_condition.likelihood
+
+    if forced:
+        orders = np.arange(n_orders)
+        n_items = np.maximum(quantity_distribution.sample_n(n_orders, rng), 1)
+    else:
+        orders = np.flatnonzero(rng.random_sample(n_orders) < order_likelihood)
+        n_items = quantity_distribution.sample_n(orders.size, rng)
+    n_items = np.minimum(n_items, len(items))
+    order_index = np.repeat(orders, n_items)
+    item_index = _select_items(np.array([item.likelihood for item in items]), n_items, rng)
+
+    multiplier = np.ones(n_orders)
+    price_active = np.zeros(n_orders, dtype=bool)
+    if price_condition and not no_conditions:
+        price_active = price_condition.is_active_batch(n_orders, rng)
+        multiplier[price_active] = price_condition.activate_batch(price_active.sum(), rng)
+
+    int_quantities = all(item.quantity_distribution.int_or_float == "int" for item in items)
+    quantity = np.zeros(item_index.size, dtype=int if int_quantities else float)
+    variant = np.full(item_index.size, None, dtype=object)
+    for index in np.unique(item_index):
+        rows = item_index == index
+        item = items[index]
+        quantity[rows] = item.quantity_distribution.sample_n(rows.sum(), rng)
+        if item.variant_distribution:
+            variant[rows] = item.variant_distribution.sample_n(rows.sum(), rng)
+
+    price = prices[item_index]
+    if minor_units:
+        final_price = apply_factor(apply_factor(price, multiplier[order_index]), quantity)
+    else:
+        final_price = (price * multiplier[order_index]) * quantity
+    probability_name = f"condition_{probability_condition.condition_id}" if probability_condition else None
+    price_name = f"condition_{price_condition.condition_id}" if price_condition else None
+    return {
+        "order_index": order_index,
+        "item_category_id": np.full(item_index.size, item_category_id),
+        "service_id": np.array([item.service_id for item in items], dtype=object)[item_index],
+        "price": price,
+        "quantity": quantity,
+        "final_price": final_price,
+        "variant": variant,
+        "conditions": [
+            [name for name, active in ((probability_name, probability_active[o]), (price_name, price_active[o])) if active]
+            for o in order_index
+        ],
+    }
 
-class ItemCategory(BaseModel):
-    item_category_id: int
-    likelihood: float
-    quantity_distribution: Distribution
-    items: list[Item]
-    probability_condition: Optional[Condition] = None
-    price_condition: Optional[Condition] = None
-    joint_item_category_condition: Optional[ItemCategoryInclusionCondition] = None
-
-    @model_validator(mode="before")
-    @classmethod
-    def quantity_distribution_check(cls, v) -> dict:
-        quantity_distribution: Distribution = v["quantity_distribution"]
-        if quantity_distribution.upper_bound > len(v["items"]):
-            raise ValueError("Quantity distribution upper bound must be less than or equal to the number of items")
-        return v
-
-    def sample_items(self, no_conditions: bool = False) -> dict:
-        items: list[Item] = []
-        active_conditions: list[int] = []
-        likelihood = self.likelihood
-
-        if self.probability_condition and self.probability_condition.is_active() and not no_conditions:
-            likelihood = self.probability_condition.likelihood
-            active_conditions.append(f"condition_{self.probability_condition.condition_id}")
-
-        if np.random.choice([True, False], p=[likelihood, 1 - likelihood]):
-            probabilities = np.array([item.likelihood for item in self.items])
-            probabilities /= probabilities.sum()
-            items: list[Item] = np.random.choice(
-                self.items,
-                size=self.quantity_distribution.sample(), 
-                replace=False,
-                p=probabilities
-            )
-
-        multiplier = 1
-        if self.price_condition and self.price_condition.is_active() and not no_conditions:
-            multiplier = self.price_condition.activate()
-            active_conditions.append(f"condition_{self.price_condition.condition_id}")
-
-        additional_items = []
-        if self.joint_item_category_condition and self.joint_item_category_condition.is_active() and not no_conditions:
-            active_conditions.append(f"condition_{self.joint_item_category_condition.condition_id}")
-            additional_items = self.joint_item_category_condition.activate()
-        
-        final_items = [item.sample(multiplier) for item in items] 
-        if len(final_items) == 0:
-            return {
-                "item_category_id": self.item_category_id,
-                "items": [],
-                "conditions": []
-            }
-        
-        final_items += additional_items
-        return {
-            "item_category_id": self.item_category_id,
-            "items": final_items,
-            "conditions": active_conditions
-        }
-    
-    def modify_prices(self, factor: float):
-        for item in self.items:
-            item.price_modification(factor)
-    
 
 class ItemCategorySelectionPool:
     
@@ -129,6 +169,7 @@ class ItemCategorySelectionPool:
         self.likelihood_lower_bound = likelihood_lower_bound
         self.category_quantity_distribution = category_quantity_distribution
         self.joint_item_category_condition = None
+        self.joint_item_category_pool = None
         
         self.probability_condition = None
         if np.random.choice([True, False]):
@@ -172,30 +213,100 @@ class ItemCategorySelectionPool:
             ) for service_id in range(1, n_services + 1)
         ]
 
-    def add_joint_item_category_condition(self, item_category_selection_pool: "ItemCategorySelectionPool") -> None:
-        # item_category = item_category_selection_pool.sample_items(1)
-        # self.joint_item_category_condition = ItemCategoryInclusionCondition(
-        #     condition_id=f"{self.item_category_id}_{item_category.item_category_id}",
-        #     item_category=item_category,
-        #     no_conditions=True,
-        # )
-        raise NotImplementedError("This method is not yet implemented.")
+    def add_joint_item_category_condition(
+            self,
+            item_category_selection_pool: "ItemCategorySelectionPool",
+            likelihood: Optional[float] = None,
+            no_conditions: bool = True,
+        ) -> None:
+        """
+        Make items of another pool's category co-occur with this pool's category.
+
+        Args:
+            item_category_selection_pool (ItemCategorySelectionPool): The pool whose category is drawn into the order.
+            likelihood (Optional[float], optional): The likelihood the condition is active on an order containing this
+                category but not the other one. Defaults to np.random.uniform(0, 1).
+            no_conditions (bool, optional): Whether the jointly drawn items ignore their own category's conditions. Defaults to True.
+        """
+        if item_category_selection_pool.item_category_id == self.item_category_id:
+            raise ValueError("A joint item category condition must target a different item category")
+        self.joint_item_category_condition = ItemCategoryInclusionCondition(
+            condition_id=f"{self.item_category_id}_{item_category_selection_pool.item_category_id}_joint",
+            likelihood=np.random.uniform(0, 1) if likelihood is None else likelihood,
+            item_category_id=item_category_selection_pool.item_category_id,
+            no_conditions=no_conditions,
+        )
+        # Pools may share an item_category_id, so the target is kept by reference
+        self.joint_item_category_pool = item_category_selection_pool
 
     def __len__(self) -> int:
         return len(self.items)
 
-    def sample_items(self, n_samples: int) -> ItemCategory:
-        if n_samples > len(self):
+    def sample_memberships(
+            self,
+            n_samples: np.ndarray,
+            max_samples: int,
+            rng: Optional[np.random.RandomState] = None,
+        ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Draw the category likelihood and item memberships of many customers at once.
+
+        Args:
+            n_samples (np.ndarray): The number of items each customer gets from the pool.
+            max_samples (int): The width of the membership array, at least n_samples.max().
+            rng (Optional[np.random.RandomState], optional): The random state to draw from. Defaults to the global numpy state.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The customers' likelihoods, and their item indexes into the pool's items
+                with -1 marking unused slots.
+        """
+        rng = rng or np.random
+        if np.any(n_samples > len(self)):
             warnings.warn(f"Number of samples requested is greater than the number of items in the category. Returning all items.")
-        n_samples = min(n_samples, len(self))
+        n_samples = np.minimum(n_samples, len(self))
         likelihood_mean = (self.likelihood_upper_bound + self.likelihood_lower_bound) / 2
         likelihood_std_dev = (self.likelihood_upper_bound - self.likelihood_lower_bound) / 4
-        return ItemCategory(
+        likelihoods = np.clip(rng.normal(likelihood_mean, likelihood_std_dev, n_samples.size), 0, 1)
+        slots = rng.randint(0, len(self), (n_samples.size, max_samples))
+        slots[np.arange(max_samples) >= n_samples[:, None]] = -1
+        return likelihoods, slots.astype(np.min_scalar_type(-len(self)))
+
+    def slot_prices(self, slots: np.ndarray, factors: np.ndarray, minor_units: bool = False) -> np.ndarray:
+        """
+        Price every membership slot as the pool item's price times the customer's factor, with 0 for unused slots.
+        """
+        prices = np.array([item.price for item in self.items])
+        rounded = np.array([item.rounded for item in self.items])
+        if minor_units:
+            slot_prices = apply_factor(to_minor_units(prices)[slots], factors[:, None])
+        else:
+            slot_prices = prices[slots] * factors[:, None]
+            slot_prices = np.where(rounded[slots], np.round(slot_prices, 2), slot_prices)
+        return np.where(slots >= 0, slot_prices, 0)
+
+    def sample_order_items(
+            self,
+            likelihood: float,
+            slots: np.ndarray,
+            prices: np.ndarray,
+            n_orders: int = 1,
+            no_conditions: bool = False,
+            forced: bool = False,
+            rng: Optional[np.random.RandomState] = None,
+            minor_units: bool = False,
+        ) -> dict:
+        used = slots >= 0
+        return sample_category_items(
             item_category_id=self.item_category_id,
-            likelihood=np.clip(np.random.normal(likelihood_mean, likelihood_std_dev), 0, 1),
+            likelihood=likelihood,
             quantity_distribution=self.category_quantity_distribution,
+            items=[self.items[slot] for slot in slots[used]],
+            prices=prices[used],
             probability_condition=self.probability_condition,
             price_condition=self.price_condition,
-            items=np.random.choice(self.items, n_samples).tolist(),
-            joint_item_category_condition=self.joint_item_category_condition
+            n_orders=n_orders,
+            no_conditions=no_conditions,
+            forced=forced,
+            minor_units=minor_units,
+            rng=rng,
         )
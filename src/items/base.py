@@ -20,24 +20,6 @@ class Item(BaseModel):
             self.price = round(self.price, 2)
         return self
 
-    def sample_quantity(self) -> int:
-        return self.quantity_distribution.sample()
-    
-    def price_modification(self, factor: float):
-        self.price *= factor
-        if self.rounded:
-            self.price = round(self.price, 2)
-
-    def sample(self, multiplier: float = 1.0) -> dict:
-        quantity = self.sample_quantity()
-        return {
-            "service_id": self.service_id,
-            "price": self.price,
-            "quantity": quantity,
-            "final_price": (self.price * multiplier) * quantity,
-            "variant": self.variant_distribution.sample() if self.variant_distribution else None
-        }
-    
 
 def create_item(
         service_id: str,
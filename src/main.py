@@ -5,10 +5,12 @@ from src.corruptors.base import Corruptor
 
 def generate_corrupted_dataset(
         n_customers: int = 20, 
-        years: int = 3
-    ) -> pd.DataFrame:
-    universe = Universe(n_customers=n_customers, rounds_per_cycle=365)
-    corruptor = Corruptor()
+        years: int = 3,
+        analytical_views: bool = False,
+        minor_units: bool = False,
+    ) -> pd.DataFrame | tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+    universe = Universe(n_customers=n_customers, rounds_per_cycle=365, minor_units=minor_units)
+    corruptor = Corruptor(analytical_views=analytical_views, minor_units=minor_units)
     output = universe.generate_orders(n_cycles=years)
     output = corruptor.process(output)
     return output
\ No newline at end of file
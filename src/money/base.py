@@ -0,0 +1,24 @@
+import numpy as np
+
+
+MINOR_UNITS = 100  # minor units (cents) per major unit
+FACTOR_PRECISION = 10_000  # factors are applied in basis points
+
+
+def to_minor_units(amount: float | np.ndarray) -> np.int64 | np.ndarray:
+    return np.rint(np.asarray(amount, dtype=float) * MINOR_UNITS).astype(np.int64)
+
+
+def apply_factor(amount: int | np.ndarray, factor: float | np.ndarray) -> np.int64 | np.ndarray:
+    """
+    Multiply non-negative minor unit amounts by factors using integer arithmetic only.
+
+    Factors are quantised to basis points and the product is rounded half up, so the same amount and
+    factor always give the same result regardless of float representation. Integer factors (e.g. quantities)
+    are applied exactly. Amounts must already be integers; floats are refused rather than truncated.
+    """
+    amount = np.asarray(amount)
+    if not np.issubdtype(amount.dtype, np.integer):
+        raise ValueError(f"Minor unit amounts must be integers, got {amount.dtype}")
+    basis_points = np.rint(np.asarray(factor, dtype=float) * FACTOR_PRECISION).astype(np.int64)
+    return (amount.astype(np.int64) * basis_points + FACTOR_PRECISION // 2) // FACTOR_PRECISION
@@ -1,73 +1,82 @@
+from collections import Counter
+from itertools import chain
+from typing import Callable
 import numpy as np
 import pandas as pd
 
-from src.item_category.base import ItemCategory
+from src.item_category.base import ItemCategoryInclusionCondition, ItemCategorySelectionPool
 
 
-class OrderProfile:
-    def __init__(
-            self, 
-            customer_id: int, 
-            item_categories: list[ItemCategory],
-            increase_every: int = 50
-        ):
-        self.customer_id = customer_id
-        self.item_categories = item_categories
-        for item_category in self.item_categories:
-            item_category.modify_prices(1 + (((np.random.rand() * 2) - 1) / 2))
-        self.last_price_increase = 0
-        self.increase_every = increase_every
-        self.new_customer = True
-        self.order_frequency = np.random.randint(1, 5)
+def resolve_joint_conditions(pools: list[ItemCategorySelectionPool]) -> list[tuple[int, int, ItemCategoryInclusionCondition]]:
+    """
+    Precompute the joint item category conditions as (source, target) indexes into pools,
+    ordered so that every category is fully resolved before it acts as a source.
+    """
+    edges: dict[int, tuple[int, ItemCategoryInclusionCondition]] = {}
+    for source, pool in enumerate(pools):
+        condition = pool.joint_item_category_condition
+        if condition is None:
+            continue
+        targets = [target for target, other in enumerate(pools) if other is pool.joint_item_category_pool]
+        if not targets:
+            raise ValueError(f"Joint condition {condition.condition_id} targets a pool the profile does not have")
+        edges[source] = (targets[0], condition)
 
-    def increase_viable(self) -> bool:
-        if self.last_price_increase >= self.increase_every:
-            return True
-        else:
-            self.last_price_increase += 1
-            return False
-    
-    def reset_increase(self):
-        self.last_price_increase = 0
+    in_degree = Counter(target for target, _ in edges.values())
+    ready = [source for source in edges if in_degree[source] == 0]
+    ordered = []
+    while ready:
+        source = ready.pop(0)
+        target, condition = edges[source]
+        ordered.append((source, target, condition))
+        in_degree[target] -= 1
+        if in_degree[target] == 0 and target in edges:
+            ready.append(target)
+    if len(ordered) != len(edges):
+        raise ValueError("Joint item category conditions must not form a cycle")
+    return ordered
 
-    def _convert_to_order_df(self, order: dict) -> pd.DataFrame:
-        customer_id = order["customer_id"]
-        item_categories = order["item_categories"]
 
-        order_df = pd.DataFrame()
-        for item_category in item_categories:
-            item_category_id = item_category["item_category_id"]
-            item_category_conditions = item_category["conditions"]
-            item_category_items = pd.DataFrame(item_category["items"])
-            item_category_items["item_category_id"] = item_category_id
-            item_category_items["conditions"] = [item_category_conditions for _ in range(len(item_category_items))]
-            item_category_items["customer_id"] = customer_id
-            item_category_items["new_customer"] = self.new_customer
-            order_df = pd.concat([order_df, item_category_items])
+def sample_order_batch(
+        samplers: list[Callable[..., dict]],
+        joint_conditions: list[tuple[int, int, ItemCategoryInclusionCondition]],
+        n_orders: int,
+        rng: np.random.RandomState,
+    ) -> list[dict]:
+    """
+    Sample a batch of orders from one sampler per item category, then resolve the joint conditions.
 
-        return order_df
+    Each sampler is called as sampler(n_orders, no_conditions=..., forced=..., rng=...) and returns item lines
+    in the format of `sample_category_items`.
+    """
+    item_categories = [sampler(n_orders, rng=rng) for sampler in samplers]
+    present = [np.bincount(x["order_index"], minlength=n_orders) > 0 for x in item_categories]
 
-    def sample(self) -> pd.DataFrame:
-        item_categories = [item_category.sample_items() for item_category in self.item_categories]
-        item_categories = [x for x in item_categories if x["items"]]
-        output = self._convert_to_order_df({
-            "customer_id": self.customer_id,
-            "item_categories": item_categories
-        })
-        self.new_customer = False
-        return output
-    
-    def modify_all_prices(self, factor: float):
-        for item_category in self.item_categories:
-            item_category.modify_prices(factor)
+    # Joint conditions are drawn for every affected order of the batch at once
+    for source, target, condition in joint_conditions:
+        affected = np.flatnonzero(present[source] & ~present[target])
+        active = affected[condition.is_active_batch(affected.size, rng)]
+        joint_items = samplers[target](active.size, no_conditions=condition.no_conditions, forced=True, rng=rng)
+        joint_items["order_index"] = active[joint_items["order_index"]]
+        joint_items["conditions"] = [
+            conditions + [f"condition_{condition.condition_id}"] for conditions in joint_items["conditions"]
+        ]
+        present[target][active] = True
+        item_categories.append(joint_items)
+    return item_categories
 
-    def modify_prices(self, item_category_id: int, factor: float):
-        for item_category in self.item_categories:
-            if item_category.item_category_id == item_category_id:
-                item_category.modify_prices(factor)
-                break
 
-    def modify_prices_random(self, factor: float, n: int):
-        item_category: list[ItemCategory] = np.random.choice(self.item_categories, min(n, len(self.item_categories)), replace=False)
-        for item in item_category:
-            item.modify_prices(factor)
\ No newline at end of file
+def to_order_df(item_categories: list[dict], customer_id: int, new_customer: bool) -> pd.DataFrame:
+    order_df = pd.DataFrame({
+        key: np.concatenate([item_category[key] for item_category in item_categories])
+        for key in ["order_index", "service_id", "price", "quantity", "final_price", "variant", "item_category_id"]
+    })
+    order_df["conditions"] = list(chain.from_iterable(item_category["conditions"] for item_category in item_categories))
+    order_df = order_df.sort_values("order_index", kind="stable", ignore_index=True)
+    order_df["customer_id"] = customer_id
+    order_df["new_customer"] = new_customer & (order_df["order_index"] == 0)
+    order_index = order_df.pop("order_index").to_numpy()
+    order_df["order_number"] = order_index + 1
+    order_df["line_number"] = np.arange(order_index.size) - np.searchsorted(order_index, order_index) + 1
+    return order_df
+
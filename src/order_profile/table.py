@@ -0,0 +1,152 @@
+from functools import partial
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from src.item_category.base import ItemCategorySelectionPool
+from src.money.base import apply_factor
+from src.order_profile.base import resolve_joint_conditions, sample_order_batch, to_order_df
+
+
+class ProfileTable:
+    """
+    Columnar store of customer order profiles, one row per customer.
+
+    For every item category selection pool the table holds each customer's likelihood of ordering from the
+    category, the pool items the customer buys (`slots`, indexes into the pool's items with -1 marking unused
+    slots) and the customer's price for each slot. The pools' items act as shared templates for everything else.
+    """
+
+    def __init__(
+            self,
+            pools: list[ItemCategorySelectionPool],
+            customer_id: np.ndarray,
+            increase_every: np.ndarray,
+            order_frequency: np.ndarray,
+            likelihoods: list[np.ndarray],
+            slots: list[np.ndarray],
+            prices: list[np.ndarray],
+            minor_units: bool = False,
+        ):
+        self.pools = pools
+        self.customer_id = np.asarray(customer_id, dtype=np.int64)
+        self.increase_every = np.asarray(increase_every, dtype=np.int64)
+        self.order_frequency = np.asarray(order_frequency, dtype=np.int64)
+        self.likelihoods = likelihoods
+        self.slots = slots
+        self.prices = prices
+        self.minor_units = minor_units
+        self.last_price_increase = np.zeros(len(self.customer_id), dtype=np.int64)
+        self.new_customer = np.ones(len(self.customer_id), dtype=bool)
+        self._rounded = [np.array([item.rounded for item in pool.items]) for pool in pools]
+        self._joint_conditions = resolve_joint_conditions(pools)
+
+    @classmethod
+    def sample(
+            cls,
+            pools: list[ItemCategorySelectionPool],
+            customer_ids: np.ndarray,
+            n_item_sample_bounds: tuple[int, int],
+            increase_every_options: list[int],
+            minor_units: bool = False,
+            rng: Optional[np.random.RandomState] = None,
+        ) -> "ProfileTable":
+        """
+        Draw the profiles of many customers in a handful of vectorized calls.
+
+        Args:
+            pools (list[ItemCategorySelectionPool]): The pools customers' item categories are sampled from.
+            customer_ids (np.ndarray): The customers to draw profiles for.
+            n_item_sample_bounds (tuple[int, int]): The bounds of the number of items a customer gets per pool.
+            increase_every_options (list[int]): The possible number of days between price amendments.
+            minor_units (bool, optional): Whether to hold prices as int64 minor units. Defaults to False.
+            rng (Optional[np.random.RandomState], optional): The random state to draw from. Defaults to the global numpy state.
+        """
+        rng = rng or np.random
+        n_customers = len(customer_ids)
+        likelihoods, slots = [], []
+        for pool in pools:
+            n_samples = rng.randint(n_item_sample_bounds[0], n_item_sample_bounds[1], n_customers)
+            max_samples = min(n_item_sample_bounds[1] - 1, len(pool))
+            pool_likelihoods, pool_slots = pool.sample_memberships(n_samples, max_samples, rng)
+            likelihoods.append(pool_likelihoods)
+            slots.append(pool_slots)
+        factors = 1 + (((rng.rand(n_customers, len(pools)) * 2) - 1) / 2)
+        prices = [
+            pool.slot_prices(pool_slots, factors[:, index], minor_units)
+            for index, (pool, pool_slots) in enumerate(zip(pools, slots))
+        ]
+        increase_every = rng.choice(increase_every_options, n_customers)
+        order_frequency = rng.randint(1, 5, n_customers)
+        return cls(pools, customer_ids, increase_every, order_frequency, likelihoods, slots, prices, minor_units)
+
+    @classmethod
+    def concat(cls, tables: list["ProfileTable"]) -> "ProfileTable":
+        table = cls(
+            tables[0].pools,
+            np.concatenate([x.customer_id for x in tables]),
+            np.concatenate([x.increase_every for x in tables]),
+            np.concatenate([x.order_frequency for x in tables]),
+            [np.concatenate(x) for x in zip(*[t.likelihoods for t in tables])],
+            [np.concatenate(x) for x in zip(*[t.slots for t in tables])],
+            [np.concatenate(x) for x in zip(*[t.prices for t in tables])],
+            tables[0].minor_units,
+        )
+        table.last_price_increase = np.concatenate([x.last_price_increase for x in tables])
+        table.new_customer = np.concatenate([x.new_customer for x in tables])
+        return table
+
+    def take(self, rows: np.ndarray) -> "ProfileTable":
+        table = ProfileTable(
+            self.pools,
+            self.customer_id[rows],
+            self.increase_every[rows],
+            self.order_frequency[rows],
+            [x[rows] for x in self.likelihoods],
+            [x[rows] for x in self.slots],
+            [x[rows] for x in self.prices],
+            self.minor_units,
+        )
+        table.last_price_increase = self.last_price_increase[rows]
+        table.new_customer = self.new_customer[rows]
+        return table
+
+    def __len__(self) -> int:
+        return len(self.customer_id)
+
+    def modify_prices(self, pool_index: int, rows: np.ndarray, factors: np.ndarray):
+        prices = self.prices[pool_index][rows]
+        used = self.slots[pool_index][rows] >= 0
+        if self.minor_units:
+            prices = apply_factor(prices, factors[:, None])
+        else:
+            rounded = self._rounded[pool_index][self.slots[pool_index][rows]]
+            prices = prices * factors[:, None]
+            prices = np.where(rounded, np.round(prices, 2), prices)
+        self.prices[pool_index][rows] = np.where(used, prices, 0)
+
+    def apply_amendments(self, events: pd.DataFrame):
+        """
+        Apply price amendment events, as produced by `schedule_amendments`, to the table's prices.
+
+        A profile row may only appear once per pool_index, i.e. apply one day's events at a time.
+        """
+        for pool_index, pool_events in events.groupby("pool_index"):
+            self.modify_prices(pool_index, pool_events["row"].to_numpy(), pool_events["factor"].to_numpy())
+
+    def sample_orders(self, row: int, n_orders: int = 1, rng: Optional[np.random.RandomState] = None) -> pd.DataFrame:
+        rng = rng or np.random
+        samplers = [
+            partial(
+                pool.sample_order_items,
+                self.likelihoods[index][row],
+                self.slots[index][row],
+                self.prices[index][row],
+                minor_units=self.minor_units,
+            )
+            for index, pool in enumerate(self.pools)
+        ]
+        item_categories = sample_order_batch(samplers, self._joint_conditions, n_orders, rng)
+        output = to_order_df(item_categories, self.customer_id[row], self.new_customer[row])
+        self.new_customer[row] = False
+        return output
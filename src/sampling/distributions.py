@@ -28,22 +28,38 @@ class Distribution(BaseModel):
                 raise ValueError(f"Unsupported distribution type: {self.distribution_type}")
         return self
 
-    def sample(self) -> Union[int, float]:
+    def _draw(self, rng: np.random.RandomState, size: Optional[int] = None) -> Union[float, np.ndarray]:
+        if self.distribution_type == "normal":
+            return rng.normal(self.mean, self.std_dev, size)
+        elif self.distribution_type == "longtail":
+            return rng.lognormal(self.mean, self.std_dev, size)
+        elif self.distribution_type == "uniform":
+            return rng.uniform(self.lower_bound, self.upper_bound, size)
+        else:
+            raise ValueError(f"Unsupported distribution type: {self.distribution_type}")
+
+    def sample(self, rng: Optional[np.random.RandomState] = None) -> Union[int, float]:
+        rng = rng or np.random
         while True:
-            if self.distribution_type == "normal":
-                value = np.random.normal(self.mean, self.std_dev)
-            elif self.distribution_type == "longtail":
-                value = np.random.lognormal(self.mean, self.std_dev)
-            elif self.distribution_type == "uniform":
-                value = np.random.uniform(self.lower_bound, self.upper_bound)
-            else:
-                raise ValueError(f"Unsupported distribution type: {self.distribution_type}")
-            
+            value = self._draw(rng)
             if self.lower_bound <= value <= self.upper_bound:
                 break  # Accept only values within bounds
         if self.int_or_float == "int":
             value = int(value)
         return value
+
+    def sample_n(self, size: int, rng: Optional[np.random.RandomState] = None) -> np.ndarray:
+        rng = rng or np.random
+        values = np.empty(size)
+        missing = np.arange(size)
+        while missing.size:
+            draws = self._draw(rng, missing.size)
+            accepted = (self.lower_bound <= draws) & (draws <= self.upper_bound)
+            values[missing[accepted]] = draws[accepted]
+            missing = missing[~accepted]  # Redraw only the values that fell outside the bounds
+        if self.int_or_float == "int":
+            values = values.astype(int)
+        return values
     
     @model_validator(mode="before")
     @classmethod
@@ -0,0 +1,123 @@
+from typing import Optional
+import numpy as np
+import pandas as pd
+
+from src.order_profile.table import ProfileTable
+from src.sampling.rng import KeyedRNG
+
+
+def _draw_amendments(
+        rows: np.ndarray,
+        n_pools: int,
+        amendment_probability: float,
+        rng: Optional[KeyedRNG],
+        blocks: np.ndarray,
+        positions: np.ndarray,
+        day: int,
+        block_size: int,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    if rng is None:
+        amended = rows[np.random.random_sample(rows.size) < amendment_probability]
+        return (
+            amended,
+            np.random.random_sample(amended.size),
+            np.random.randint(1, 5, amended.size),
+            np.random.random_sample((amended.size, n_pools)),
+        )
+
+    # Keyed draws come in fixed size arrays per (block, day) indexed by the customer's position in
+    # the block, so a customer's draws do not depend on which other customers are being simulated.
+    # Blocks without a viable customer are skipped entirely, which is safe as every stream is independent.
+    drawn = []
+    rows = rows[np.argsort(blocks[rows], kind="stable")]
+    unique_blocks, starts = np.unique(blocks[rows], return_index=True)
+    for block, block_rows in zip(unique_blocks, np.split(rows, starts[1:])):
+        stream = rng.stream("amendment", block, day)
+        amended = block_rows[stream.random_sample(block_size)[positions[block_rows]] < amendment_probability]
+        if amended.size == 0:
+            continue
+        drawn.append((
+            amended,
+            stream.random_sample(block_size)[positions[amended]],
+            stream.randint(1, 5, block_size)[positions[amended]],
+            stream.random_sample((block_size, n_pools))[positions[amended]],
+        ))
+    if not drawn:
+        return rows[:0], np.empty(0), np.empty(0, dtype=int), np.empty((0, n_pools))
+    return tuple(np.concatenate(x) for x in zip(*drawn))
+
+
+def schedule_amendments(
+        profiles: ProfileTable,
+        start_day: int,
+        end_day: int,
+        amendment_probability: float,
+        ammendment_scale: float,
+        first_days: Optional[np.ndarray] = None,
+        rng: Optional[KeyedRNG] = None,
+        block_size: int = 4096,
+    ) -> pd.DataFrame:
+    """
+    Simulate the price amendments of every profile between start_day (inclusive) and end_day (exclusive).
+
+    Each day the profiles' counters are advanced as arrays. Profiles whose counter has reached increase_every
+    are viable, and the amendment coin, factor and amended item categories are drawn for all of them at once.
+    The profiles' counters are updated in place, their prices are not: apply the returned events with
+    `ProfileTable.apply_amendments`.
+
+    Args:
+        profiles (ProfileTable): The profiles to simulate.
+        start_day (int): The first day to simulate.
+        end_day (int): The day to stop before.
+        amendment_probability (float): The likelihood of a viable profile being amended.
+        ammendment_scale (float): The scale of the amendment factors, which are 1 +/- up to 1 / ammendment_scale.
+        first_days (Optional[np.ndarray], optional): The first day each profile exists on. Defaults to all profiles existing from start_day.
+        rng (Optional[KeyedRNG], optional): Keyed streams to draw from per (block of customers, day). Defaults to the global numpy state.
+        block_size (int, optional): The number of customer ids per keyed block. Defaults to 4096.
+
+    Returns:
+        pd.DataFrame: One row per amended item category, with the profile row, customer_id, day, factor and pool_index.
+    """
+    n_pools = len(profiles.pools)
+    if first_days is None:
+        first_days = np.full(len(profiles), start_day)
+    blocks = (profiles.customer_id - 1) // block_size
+    positions = (profiles.customer_id - 1) % block_size
+
+    events: list[pd.DataFrame] = []
+    for day in range(start_day, end_day):
+        active = first_days <= day
+        viable = active & (profiles.last_price_increase >= profiles.increase_every)
+        profiles.last_price_increase[active & ~viable] += 1
+        rows = np.flatnonzero(viable)
+        if rows.size == 0:
+            continue
+
+        amended, factor_draws, n, keys = _draw_amendments(
+            rows, n_pools, amendment_probability, rng, blocks, positions, day, block_size
+        )
+        if amended.size == 0:
+            continue
+        profiles.last_price_increase[amended] = 0
+
+        factors = 1 + np.round(((factor_draws * 2) - 1) / ammendment_scale, 2)
+        # A random subset of min(n, n_pools) item categories per amendment, without replacement
+        selected = np.arange(n_pools) < np.minimum(n, n_pools)[:, None]
+        n_selected = selected.sum(axis=1)
+        events.append(pd.DataFrame({
+            "row": np.repeat(amended, n_selected),
+            "customer_id": np.repeat(profiles.customer_id[amended], n_selected),
+            "day": day,
+            "factor": np.repeat(factors, n_selected),
+            "pool_index": np.argsort(keys, axis=1)[selected],
+        }))
+
+    if not events:
+        return pd.DataFrame({
+            "row": pd.Series(dtype=np.int64),
+            "customer_id": pd.Series(dtype=np.int64),
+            "day": pd.Series(dtype=np.int64),
+            "factor": pd.Series(dtype=float),
+            "pool_index": pd.Series(dtype=np.int64),
+        })
+    return pd.concat(events, ignore_index=True)
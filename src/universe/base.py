@@ -1,10 +1,14 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
+from typing import Optional
 
 from src.item_category.base import ItemCategorySelectionPool
-from src.order_profile.base import OrderProfile
+from src.order_profile.table import ProfileTable
+from src.universe.amendments import schedule_amendments
 from src.sampling.distributions import Distribution
+from src.sampling.rng import KeyedRNG
+from src.views.base import AnalyticalViews
 from src.constants import FIXED_COLS
 
 
@@ -125,10 +129,15 @@ DEFAULT_SELECTION_POOLS = {
         variant_lower_bound=None,
     ),
 }
+DEFAULT_SELECTION_POOLS["plane_services"].add_joint_item_category_condition(
+    DEFAULT_SELECTION_POOLS["labour_rates"], likelihood=1.0
+)
 
 class Universe:
 
     _cols: list[str] = FIXED_COLS
+    _start_date: datetime = datetime(1990, 1, 1)
+    _profile_block_size: int = 4096  # customers drawn per keyed profile stream
 
     def __init__(
             self,
@@ -136,85 +145,243 @@ class Universe:
             item_category_selection_pools: dict[str, ItemCategorySelectionPool] = DEFAULT_SELECTION_POOLS,
             n_item_sample_bounds: tuple[int, int] = (3, 5),
             rounds_per_cycle: int = 50,
+            analytical_views: bool = False,
+            seed: Optional[int] = None,
+            minor_units: bool = False,
     ):
+        """
+        Instantiate a Universe object.
+
+        Args:
+            n_customers (int, optional): The number of customers present from the first day. Defaults to 50.
+            item_category_selection_pools (dict[str, ItemCategorySelectionPool], optional): The pools customers' item categories are sampled from. Defaults to DEFAULT_SELECTION_POOLS.
+            n_item_sample_bounds (tuple[int, int], optional): The bounds of the number of items a customer gets per item category. Defaults to (3, 5).
+            rounds_per_cycle (int, optional): The number of days in a cycle. Defaults to 50.
+            analytical_views (bool, optional): Whether to maintain aggregate views alongside the orders. Defaults to False.
+            seed (Optional[int], optional): When set, every random draw is keyed by (seed, customer_id, day, purpose) through a
+                counter-based generator instead of the global numpy state, which makes `generate_slice` available. Profiles
+                are keyed per block of customer ids so they can still be drawn in bulk. Defaults to None.
+            minor_units (bool, optional): Whether to hold all money as int64 minor units (cents), with price and final_price
+                emitted in minor units. Defaults to False.
+        """
+        self.n_customers = n_customers
         self.rounds_per_cycle = rounds_per_cycle
         self.n_item_sample_bounds = n_item_sample_bounds
         self.item_category_selection_pools = item_category_selection_pools
-        self.profiles = [
-            OrderProfile(
-                customer_id=customer_id,
-                item_categories=[
-                    item_category_selection_pools[key]
-                    .sample_items(n_samples=np.random.randint(n_item_sample_bounds[0], n_item_sample_bounds[1])) 
-                    for key in item_category_selection_pools.keys()
-                ],
-                increase_every=np.random.choice([
-                    (self.rounds_per_cycle//4) * 1, 
-                    (self.rounds_per_cycle//4) * 2, 
-                    (self.rounds_per_cycle//4) * 3, 
-                    (self.rounds_per_cycle//4) * 4
-                ])
-            ) for customer_id in range(1, n_customers + 1)
-        ]
+        self.minor_units = minor_units
+        self._rng = KeyedRNG(seed) if seed is not None else None
+        self.profiles = self._create_profiles(np.arange(1, n_customers + 1))
         self._cycle = 0
-        self._date = datetime(1990, 1, 1)
+        self._date = self._start_date
+        self.views = AnalyticalViews() if analytical_views else None
+        self._amendment_events: list[pd.DataFrame] = []
 
-    def add_customer(self):
-        self.profiles.append(
-            OrderProfile(
-                customer_id=len(self.profiles) + 1,
-                item_categories=[
-                    self.item_category_selection_pools[key]
-                    .sample_items(n_samples=np.random.randint(self.n_item_sample_bounds[0], self.n_item_sample_bounds[1]))
-                    for key in self.item_category_selection_pools.keys()
-                ],
-                increase_every=np.random.choice([
-                    (self.rounds_per_cycle//4) * 1, 
-                    (self.rounds_per_cycle//4) * 2, 
-                    (self.rounds_per_cycle//4) * 3, 
-                    (self.rounds_per_cycle//4) * 4
-                ])
+    def _stream(self, purpose: str, customer_id: int = 0, day: int = 0) -> Optional[np.random.RandomState]:
+        if self._rng is None:
+            return None
+        return self._rng.stream(purpose, customer_id, day)
+
+    def _create_profiles(self, customer_ids: np.ndarray) -> ProfileTable:
+        pools = list(self.item_category_selection_pools.values())
+        increase_every_options = [(self.rounds_per_cycle//4) * x for x in range(1, 5)]
+        if self._rng is None:
+            return ProfileTable.sample(
+                pools, customer_ids, self.n_item_sample_bounds, increase_every_options, self.minor_units
+            )
+        # Draw whole blocks of customers from their keyed stream and keep the requested ones,
+        # so a customer's profile never depends on which other customers are drawn with it.
+        customer_ids = np.sort(customer_ids)
+        blocks = (customer_ids - 1) // self._profile_block_size
+        tables = []
+        for block in blocks[np.diff(blocks, prepend=-1) != 0]:
+            first_id = block * self._profile_block_size + 1
+            table = ProfileTable.sample(
+                pools, np.arange(first_id, first_id + self._profile_block_size), self.n_item_sample_bounds,
+                increase_every_options, self.minor_units, rng=self._stream("profile", block)
             )
+            block_ids = customer_ids[np.searchsorted(blocks, block):np.searchsorted(blocks, block, side="right")]
+            tables.append(table.take(block_ids - first_id))
+        return ProfileTable.concat(tables)
+
+    def add_customer(self):
+        self.profiles = ProfileTable.concat([self.profiles, self._create_profiles(np.array([len(self.profiles) + 1]))])
+
+    def _new_customer_joins(self, cycle: int, new_customer_probability: float) -> bool:
+        rng = self._stream("new_customer", day=cycle) or np.random
+        return rng.choice([True, False], p=[new_customer_probability, 1 - new_customer_probability])
+
+    def _schedule_amendments(
+            self,
+            profiles: ProfileTable,
+            start_day: int,
+            end_day: int,
+            amendment_probability: float,
+            ammendment_scale: float,
+            first_days: Optional[np.ndarray] = None,
+        ) -> pd.DataFrame:
+        return schedule_amendments(
+            profiles, start_day, end_day, amendment_probability, ammendment_scale,
+            first_days=first_days, rng=self._rng, block_size=self._profile_block_size
         )
 
+    def _to_amendment_events(self, events: pd.DataFrame) -> pd.DataFrame:
+        pool_keys = np.array(list(self.item_category_selection_pools.keys()), dtype=object)
+        pool_ids = np.array([pool.item_category_id for pool in self.item_category_selection_pools.values()])
+        return pd.DataFrame({
+            "customer_id": events["customer_id"].to_numpy(),
+            "date": self._start_date + pd.to_timedelta(events["day"].to_numpy(), unit="D"),
+            "item_category_selection_pool": pool_keys[events["pool_index"].to_numpy()],
+            "item_category_id": pool_ids[events["pool_index"].to_numpy()],
+            "factor": events["factor"].to_numpy(),
+        })
+
+    @property
+    def amendment_events(self) -> pd.DataFrame:
+        """
+        The price amendments applied so far, one row per amended item category, which together with the
+        initial profiles give each customer's price timeline.
+        """
+        if not self._amendment_events:
+            return self._to_amendment_events(pd.DataFrame({"customer_id": [], "day": [], "pool_index": [], "factor": []}, dtype=np.int64))
+        return pd.concat(self._amendment_events, ignore_index=True)
+
+    def _sample_amended_day(self, profiles: ProfileTable, rows: np.ndarray, day: int, day_events: pd.DataFrame) -> list[pd.DataFrame]:
+        profiles.apply_amendments(day_events)
+        amended = np.zeros(len(profiles), dtype=bool)
+        amended[day_events["row"].to_numpy()] = True
+        return [self._sample_day(profiles, row, day, amended[row]) for row in rows]
+
+    def _sample_day(self, profiles: ProfileTable, row: int, day: int, increased: bool) -> pd.DataFrame:
+        rng = self._stream("orders", profiles.customer_id[row], day)
+        orders = profiles.sample_orders(row, profiles.order_frequency[row], rng)
+        orders["contract_ammendment"] = increased
+        orders["date"] = self._start_date + timedelta(days=day)
+        return orders
+
+    def _to_orders_df(self, orders: list[pd.DataFrame], first_line: int = 0) -> pd.DataFrame:
+        orders_df = pd.concat(orders, ignore_index=True)
+        # The index numbers the item lines, the exploded copies of a line keep its number
+        orders_df.index += first_line
+
+        orders_df_conditions_exploded = orders_df.explode("conditions")
+        orders_df = pd.get_dummies(orders_df_conditions_exploded, columns=["conditions"], prefix="", prefix_sep="")
+
+        return orders_df[self._cols + [x for x in orders_df.columns if x not in self._cols]]
+
+    def _combine_orders_dfs(self, orders_dfs: list[pd.DataFrame]) -> pd.DataFrame:
+        orders_df = pd.concat(orders_dfs)
+        conditions = sorted(x for x in orders_df.columns if x.startswith("condition_"))
+        # A condition that never activated in a chunk has no column there
+        orders_df[conditions] = orders_df[conditions].astype("boolean").fillna(False).astype(bool)
+        return orders_df[
+            self._cols
+            + [x for x in orders_df.columns if x not in self._cols and x not in conditions]
+            + conditions
+        ]
+
     def generate_orders(
             self, 
             n_cycles: int = 10, 
             amendment_probability: float = 0.8,
             ammendment_scale: float = 10.0,
             new_customer_probability: float = 0.05,
-        ) -> pd.DataFrame:
-        orders: list[pd.DataFrame] = []
+        ) -> pd.DataFrame | tuple[pd.DataFrame, dict[str, pd.DataFrame]]:
+        orders_dfs: list[pd.DataFrame] = []
+        n_lines = 0
 
         start_cycle = self._cycle
         for cycle in range(start_cycle, start_cycle + n_cycles + 1):
+            # The whole cycle's amendments are drawn up front, customers only join between cycles
+            cycle_start = (self._date - self._start_date).days
+            events = self._schedule_amendments(
+                self.profiles, cycle_start, cycle_start + self.rounds_per_cycle, amendment_probability, ammendment_scale
+            )
+            self._amendment_events.append(self._to_amendment_events(events))
+            events_by_day = dict(tuple(events.groupby("day")))
+            rows = np.arange(len(self.profiles))
+            orders: list[pd.DataFrame] = []
             for r in range(1, self.rounds_per_cycle + 1):
-                for profile in self.profiles:
-                    increased = False
-                    if profile.increase_viable():
-                        if np.random.choice([True, False], p=[amendment_probability, 1 - amendment_probability]):
-                            profile.modify_prices_random(
-                                factor=1 + round(((np.random.rand() * 2) - 1) / ammendment_scale, 2),
-                                n=np.random.randint(1, 5)
-                            )
-                            increased = True
-                            profile.reset_increase()
-                    for o_index in range(profile.order_frequency):
-                        order = profile.sample()
-                        order["order_number"] = o_index + 1
-                        order["contract_ammendment"] = increased
-                        order["date"] = self._date
-                        orders.append(order)
+                day = (self._date - self._start_date).days
+                orders += self._sample_amended_day(self.profiles, rows, day, events_by_day.get(day, events.iloc[:0]))
                 self._date += timedelta(days=1)
+            # Each cycle is a run of complete days, so it is folded into the views as soon as it is generated
+            orders_dfs.append(self._to_orders_df(orders, n_lines))
+            n_lines += sum(len(x) for x in orders)
+            if self.views is not None:
+                self.views.update(orders_dfs[-1])
             self._cycle += 1
-            if np.random.choice([True, False], p=[new_customer_probability, 1 - new_customer_probability]):
+            if self._new_customer_joins(cycle, new_customer_probability):
                 self.add_customer()
 
-        orders_df = pd.concat(orders, ignore_index=True)
+        orders_df = self._combine_orders_dfs(orders_dfs)
 
-        orders_df_conditions_exploded = orders_df.explode("conditions")
-        orders_df = pd.get_dummies(orders_df_conditions_exploded, columns=["conditions"], prefix="", prefix_sep="")
+        if self.views is not None:
+            return orders_df, self.views.frames()
+        return orders_df
+
+    def _join_days(self, max_customer_id: int, until_day: int, new_customer_probability: float) -> dict[int, int]:
+        join_days = {customer_id: 0 for customer_id in range(1, min(self.n_customers, max_customer_id) + 1)}
+        customer_id = self.n_customers
+        cycle = 0
+        while customer_id < max_customer_id and (cycle + 1) * self.rounds_per_cycle < until_day:
+            if self._new_customer_joins(cycle, new_customer_probability):
+                customer_id += 1
+                join_days[customer_id] = (cycle + 1) * self.rounds_per_cycle
+            cycle += 1
+        return join_days
 
-        orders_df = orders_df[self._cols + [x for x in orders_df.columns if x not in self._cols]]
+    def generate_slice(
+            self,
+            customer_ids: list[int],
+            start_date: datetime,
+            end_date: datetime,
+            amendment_probability: float = 0.8,
+            ammendment_scale: float = 10.0,
+            new_customer_probability: float = 0.05,
+        ) -> pd.DataFrame:
+        """
+        Generate the orders of a subset of customers between start_date (inclusive) and end_date (exclusive),
+        without simulating the rest of the universe.
 
-        return orders_df
\ No newline at end of file
+        The rows are identical to the corresponding rows of `generate_orders` on a fresh universe with the same
+        seed, pools and parameters. Each customer's prices are rebuilt from their amendment events before
+        start_date. Condition columns that never activate inside the slice are not present. The universe itself
+        is left untouched.
+
+        Args:
+            customer_ids (list[int]): The customers to generate orders for.
+            start_date (datetime): The first date of the slice.
+            end_date (datetime): The date the slice stops before.
+            amendment_probability (float, optional): As in `generate_orders`. Defaults to 0.8.
+            ammendment_scale (float, optional): As in `generate_orders`. Defaults to 10.0.
+            new_customer_probability (float, optional): As in `generate_orders`. Defaults to 0.05.
+        """
+        if self._rng is None:
+            raise ValueError("Slices can only be generated by a seeded universe")
+        start_day = (start_date - self._start_date).days
+        end_day = (end_date - self._start_date).days
+        if start_day < 0 or end_day < start_day:
+            raise ValueError("Slice dates must be on or after the universe start date and in order")
+
+        join_days = self._join_days(max(customer_ids), end_day, new_customer_probability)
+        customer_ids = np.array(sorted(customer_id for customer_id in set(customer_ids) if customer_id in join_days))
+        if customer_ids.size == 0:
+            return pd.DataFrame(columns=self._cols)
+        profiles = self._create_profiles(customer_ids)
+        first_days = np.array([join_days[customer_id] for customer_id in customer_ids])
+        events = self._schedule_amendments(
+            profiles, first_days.min(), end_day, amendment_probability, ammendment_scale, first_days=first_days
+        )
+        profiles.new_customer = first_days >= start_day
+        # Rebuild the prices as of start_date from the earlier amendment events
+        for _, day_events in events[events["day"] < start_day].groupby("day"):
+            profiles.apply_amendments(day_events)
+
+        events_by_day = dict(tuple(events[events["day"] >= start_day].groupby("day")))
+        orders: list[pd.DataFrame] = []
+        for day in range(start_day, end_day):
+            rows = np.flatnonzero(first_days <= day)
+            orders += self._sample_amended_day(profiles, rows, day, events_by_day.get(day, events.iloc[:0]))
+        if not orders:
+            return pd.DataFrame(columns=self._cols)
+        return self._to_orders_df(orders)
@@ -0,0 +1,143 @@
+import pandas as pd
+
+
+ORDER_KEYS = ["customer_id", "date", "order_number"]
+LINE_KEYS = ORDER_KEYS + ["line_number"]
+DAILY_KEYS = ["customer_id", "date"]
+PRICE_KEYS = ["customer_id", "service_id", "date"]
+VIEW_KEYS = {
+    "order_totals": ORDER_KEYS,
+    "price_changes": PRICE_KEYS,
+    "daily_customer_summary": DAILY_KEYS,
+}
+
+
+class AnalyticalViews:
+    """
+    Aggregate tables maintained alongside the order level dataset.
+
+    Each call to `update` aggregates a chunk of orders and keeps the sorted result, so a universe can fold
+    its orders in cycle by cycle as they are generated. Chunks must contain complete days, i.e. a
+    (customer_id, date) pair should never be split across two chunks, and arrive in date order. The sorted
+    chunks are merged into the views when `frames` is called, and only the chunks added since the last
+    call are merged in.
+
+    The order level dataset has one row per (item line, condition), so a line with several conditions
+    appears more than once. These copies share their (customer_id, date, order_number, line_number) and
+    are collapsed back into one row per line before aggregating.
+
+    Views:
+        order_totals: one row per (customer_id, date, order_number) with line, quantity and final_price totals.
+        price_changes: one row per (customer_id, service_id, date) on which the day's most common price differs from
+            the previous observation of that service for that customer (the first observation is always kept), with
+            the number of distinct prices charged that day.
+        daily_customer_summary: one row per (customer_id, date) with order counts and totals.
+
+    Any condition_ and flag_ columns present in the chunk are carried into the order totals and daily summaries
+    (and flag_ columns into the price changes) as booleans that are True when any underlying row is True.
+    """
+
+    def __init__(self):
+        self._views: dict[str, pd.DataFrame] = {}
+        self._pending: dict[str, list[pd.DataFrame]] = {name: [] for name in VIEW_KEYS}
+        self._last_prices = pd.Series(
+            dtype=float,
+            index=pd.MultiIndex.from_arrays([[], []], names=["customer_id", "service_id"])
+        )
+
+    @staticmethod
+    def _label_columns(df: pd.DataFrame, prefixes: tuple[str, ...]) -> list[str]:
+        return [col for col in df.columns if col.startswith(prefixes)]
+
+    @staticmethod
+    def _collapse_lines(df: pd.DataFrame, labels: list[str]) -> pd.DataFrame:
+        first = ~df.duplicated(LINE_KEYS).to_numpy()
+        if first.all():
+            return df
+        collapsed = df[first].copy()
+        collapsed[labels] = df.groupby(LINE_KEYS, sort=False)[labels].max().to_numpy()
+        return collapsed
+
+    def _update_order_totals(self, df: pd.DataFrame, labels: list[str]) -> pd.DataFrame:
+        order_totals = df.groupby(ORDER_KEYS, sort=True).agg(
+            n_lines=("service_id", "size"),
+            quantity=("quantity", "sum"),
+            final_price=("final_price", "sum"),
+            **{col: (col, "max") for col in labels}
+        )
+        self._pending["order_totals"].append(order_totals)
+        return order_totals
+
+    def _update_daily_customer_summary(self, df: pd.DataFrame, order_totals: pd.DataFrame, labels: list[str]) -> None:
+        totals = order_totals.groupby(DAILY_KEYS, sort=True).agg(
+            n_orders=("n_lines", "size"),
+            n_lines=("n_lines", "sum"),
+            quantity=("quantity", "sum"),
+            final_price=("final_price", "sum"),
+        )
+        markers = df.groupby(DAILY_KEYS, sort=True).agg(
+            new_customer=("new_customer", "max"),
+            contract_ammendment=("contract_ammendment", "max"),
+            **{col: (col, "max") for col in labels}
+        )
+        self._pending["daily_customer_summary"].append(totals.join(markers))
+
+    def _update_price_changes(self, df: pd.DataFrame, flags: list[str]) -> None:
+        # A day's price is the most common price on the day (the lowest one on ties), so it is always a price
+        # that was actually charged, in the dataset's own dtype, and a single corrupted row does not move it.
+        price_counts = df.groupby(PRICE_KEYS + ["price"], sort=True).size().rename("n_rows").reset_index()
+        day_price = (
+            price_counts.sort_values("n_rows", ascending=False, kind="stable")
+            .drop_duplicates(PRICE_KEYS)
+            .set_index(PRICE_KEYS)["price"]
+        )
+        daily_prices = df.groupby(PRICE_KEYS, sort=True).agg(
+            n_prices=("price", "nunique"),
+            **{col: (col, "max") for col in flags}
+        )
+        daily_prices.insert(0, "price", day_price)
+        series_keys = daily_prices.index.droplevel("date")
+        previous = daily_prices["price"].groupby(level=["customer_id", "service_id"]).shift(1)
+        carried = self._last_prices.reindex(series_keys).to_numpy()
+        previous = previous.fillna(pd.Series(carried, index=previous.index))
+        if pd.api.types.is_integer_dtype(daily_prices["price"]):
+            previous = previous.astype("Int64")
+
+        daily_prices.insert(2, "previous_price", previous)
+        daily_prices.insert(3, "price_change", daily_prices["price"] - previous)
+        changed = previous.isna() | (daily_prices["price"] != previous)
+        self._pending["price_changes"].append(daily_prices[changed.to_numpy(dtype=bool, na_value=True)])
+
+        last_prices = daily_prices["price"].groupby(level=["customer_id", "service_id"]).last()
+        self._last_prices = last_prices.combine_first(self._last_prices)
+
+    def update(self, df: pd.DataFrame) -> "AnalyticalViews":
+        if df.empty:
+            return self
+        labels = self._label_columns(df, ("condition_", "flag_"))
+        flags = self._label_columns(df, ("flag_",))
+        df = self._collapse_lines(df, labels)
+        order_totals = self._update_order_totals(df, labels)
+        self._update_daily_customer_summary(df, order_totals, labels)
+        self._update_price_changes(df, flags)
+        return self
+
+    def _merge(self, name: str) -> pd.DataFrame:
+        pending = self._pending[name]
+        if not pending:
+            if name not in self._views:
+                keys = VIEW_KEYS[name]
+                return pd.DataFrame(index=pd.MultiIndex.from_arrays([[] for _ in keys], names=keys))
+            return self._views[name]
+        # Every chunk is already sorted, so the stable sort only interleaves the sorted runs
+        view = pd.concat(([self._views[name]] if name in self._views else []) + pending)
+        view = view.sort_index(kind="stable")
+        # Condition or flag columns missing from some chunks mean no row was True there
+        labels = self._label_columns(view, ("condition_", "flag_"))
+        view[labels] = view[labels].astype("boolean").fillna(False).astype(bool)
+        self._views[name] = view
+        self._pending[name] = []
+        return view
+
+    def frames(self) -> dict[str, pd.DataFrame]:
+        return {name: self._merge(name) for name in VIEW_KEYS}